@@ -2,35 +2,90 @@ import zstandard as zstd
 import os
 import logging
 import time
+from concurrent.futures import ProcessPoolExecutor
 
+from utils.page_cache import drop_page_cache, fadvise
 
-def compress_with_zstd(input_file, output_file):
+
+# 缓存压缩/解压上下文，跨文件复用内部的匹配表与工作线程，避免每次调用重新分配。
+# 这些对象只能被单个线程顺序复用；多线程调用方应改用 threading.local 各自持有。
+_CCTX_CACHE = {}
+_DCTX = None
+
+
+def _get_compressor(level, threads):
+    """
+    获取指定压缩级别和线程数的缓存压缩器，不存在时创建
+    
+    参数:
+        level (int): 压缩级别
+        threads (int): zstd工作线程数，-1 表示由zstd自动决定
+    
+    返回:
+        zstd.ZstdCompressor: 压缩器实例
+    """
+    cctx = _CCTX_CACHE.get((level, threads))
+    if cctx is None:
+        # 启用长距离匹配（--long，128MB窗口）；
+        # 实际输入大小在压缩时通过 size 参数告知zstd，小文件会自动缩小窗口
+        cparams = zstd.ZstdCompressionParameters.from_level(
+            level,
+            window_log=27,
+            enable_ldm=True,
+            threads=threads
+        )
+        cctx = zstd.ZstdCompressor(compression_params=cparams)
+        _CCTX_CACHE[(level, threads)] = cctx
+    return cctx
+
+
+def _get_decompressor():
+    """
+    获取缓存的解压器，不存在时创建
+    
+    返回:
+        zstd.ZstdDecompressor: 解压器实例
+    """
+    global _DCTX
+    if _DCTX is None:
+        _DCTX = zstd.ZstdDecompressor()
+    return _DCTX
+
+
+def compress_with_zstd(input_file, output_file, level=10, threads=-1):
     """
     使用ZSTD流式压缩（分块读取避免内存溢出）
     
     参数:
         input_file (str): 输入文件路径
         output_file (str): 输出压缩文件路径
+        level (int): 压缩级别，默认10；归档场景可使用18换取少量压缩率
+        threads (int): zstd工作线程数，默认-1由zstd自动决定；0表示在调用线程上单线程压缩
     """
     try:
-        # 配置多线程压缩器
-        cctx = zstd.ZstdCompressor(level=18, threads=os.cpu_count())
-        chunk_size = 4096000 * 1024  # 1GB块大小
+        cctx = _get_compressor(level, threads)
 
         with open(input_file, "rb") as f_in, open(output_file, "wb") as f_out:
-            # 创建压缩流写入器
-            with cctx.stream_writer(f_out) as compressor:
-                while True:
-                    chunk = f_in.read(chunk_size)
-                    if not chunk:
-                        break
-                    compressor.write(chunk)
-
-        # 统计压缩后大小
-        original_size = os.path.getsize(input_file)
-        compressed_size = os.path.getsize(output_file)
-
-        ratio = (1 - compressed_size / original_size) * 100
+            # 直接对已打开的文件描述符取大小，预先告知zstd以便调整参数并在帧头写入原始大小
+            original_size = os.fstat(f_in.fileno()).st_size
+            # 顺序读取提示，让内核加大预读
+            fadvise(f_in, 'POSIX_FADV_SEQUENTIAL')
+            # 读写循环在C层完成，按zstd推荐的缓冲区大小分块，避免一次性读入大块数据
+            cctx.copy_stream(
+                f_in,
+                f_out,
+                size=original_size,
+                read_size=zstd.COMPRESSION_RECOMMENDED_INPUT_SIZE,
+                write_size=zstd.COMPRESSION_RECOMMENDED_OUTPUT_SIZE
+            )
+            # 统计压缩后大小
+            compressed_size = f_out.tell()
+            # 复用已打开的文件释放大文件的页缓存，避免挤占缓存
+            drop_page_cache(f_in, original_size)
+            drop_page_cache(f_out, compressed_size, written=True)
+
+        # 空文件没有压缩率可言，按0%记录
+        ratio = (1 - compressed_size / original_size) * 100 if original_size else 0.0
         logging.info(f"ZSTD压缩完成 - 原始大小: {original_size} bytes, 压缩率: {ratio:.2f}%")
 
         return original_size, compressed_size
@@ -40,6 +95,39 @@ def compress_with_zstd(input_file, output_file):
         raise
 
 
+def _compress_single_threaded(args):
+    """进程池任务：以单线程zstd压缩一个文件"""
+    input_file, output_file, level = args
+    return compress_with_zstd(input_file, output_file, level=level, threads=0)
+
+
+def compress_many(pairs, workers=None, level=10):
+    """
+    使用进程池并行压缩多个文件，每个工作进程负责一个文件
+    
+    对于大量中小文件，按文件并行优于单文件内的zstd多线程：zstd只有在输入
+    超过约两倍窗口大小时才会拆分出多个压缩任务，高压缩级别下单个文件基本
+    只能占用一个核心，而按文件并行可以随核数线性扩展。因此每个工作进程内
+    使用 threads=0 在调用线程上直接压缩（threads=1 仍会额外启动一个zstd工作线程），
+    避免线程过度订阅。
+    
+    参数:
+        pairs (list[tuple[str, str]]): (输入文件路径, 输出压缩文件路径) 列表
+        workers (int): 工作进程数，默认 os.cpu_count()
+        level (int): 压缩级别，默认10
+    
+    返回:
+        list[tuple[int, int]]: 与 pairs 顺序一致的 (原始大小, 压缩后大小) 列表
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            _compress_single_threaded,
+            [(input_file, output_file, level) for input_file, output_file in pairs]
+        ))
+
+
 def decompress_with_zstd(compressed_file, output_file):
     """
     使用ZSTD流式解压
@@ -49,17 +137,19 @@ def decompress_with_zstd(compressed_file, output_file):
         output_file (str): 输出解压文件路径
     """
     try:
-        dctx = zstd.ZstdDecompressor()
-        chunk_size = 4096 * 1024  # 1MB块大小
+        dctx = _get_decompressor()
 
         with open(compressed_file, "rb") as f_in, open(output_file, "wb") as f_out:
-            # 创建解压流读取器
-            with dctx.stream_reader(f_in) as reader:
-                while True:
-                    chunk = reader.read(chunk_size)
-                    if not chunk:
-                        break
-                    f_out.write(chunk)
+            fadvise(f_in, 'POSIX_FADV_SEQUENTIAL')
+            # 与压缩相同，读写循环在C层完成，不再逐块生成Python bytes对象
+            dctx.copy_stream(
+                f_in,
+                f_out,
+                read_size=zstd.DECOMPRESSION_RECOMMENDED_INPUT_SIZE,
+                write_size=zstd.DECOMPRESSION_RECOMMENDED_OUTPUT_SIZE
+            )
+            drop_page_cache(f_in, f_in.tell())
+            drop_page_cache(f_out, f_out.tell(), written=True)
 
         logging.info(f"解压完成: {compressed_file} -> {output_file}")
 
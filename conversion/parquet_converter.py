@@ -1,57 +1,132 @@
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import pyarrow.parquet as pq
 import logging
 
+from data_processing.data_reader import _FMT, LossyCastError, RaggedRowsError
+from utils.page_cache import drop_page_cache
 
-def convert_to_columnar_in_chunks(chunk_iterator, output_file, file_type):
+
+# 还原文本时每批读取的行数
+_TEXT_BATCH_SIZE = 262144
+
+
+def _select_dictionary_columns(batch, max_distinct_ratio=0.5):
+    """
+    根据首个数据块的基数估计挑选适合字典编码的列
+    
+    参数:
+        batch (pa.RecordBatch | pa.Table): 首个数据块
+        max_distinct_ratio (float): 去重值占行数的最大比例，超过则视为高基数列
+    
+    返回:
+        list: 启用字典编码的列名列表
+    """
+    dict_cols = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if pa.types.is_dictionary(column.type):
+            # 已是字典类型，直接沿用字典编码
+            dict_cols.append(name)
+            continue
+        if batch.num_rows == 0:
+            dict_cols.append(name)
+            continue
+        distinct_count = pc.count_distinct(column, mode='all').as_py()
+        if distinct_count / batch.num_rows <= max_distinct_ratio:
+            dict_cols.append(name)
+    return dict_cols
+
+
+def _needs_quoting(batch, sep):
+    """
+    判断数据块中是否存在需要加引号的字符串值
+    
+    参数:
+        batch (pa.RecordBatch): 数据块
+        sep (str): 字段分隔符
+    
+    返回:
+        bool: 任一字符串列包含分隔符、引号或换行符时返回True
+    """
+    pattern = "[" + "".join(f"\\x{{{ord(c):02x}}}" for c in sep + '"\r\n') + "]"
+    for column in batch.columns:
+        if pa.types.is_string(column.type) and pc.any(pc.match_substring_regex(column, pattern)).as_py():
+            return True
+    return False
+
+
+def convert_to_columnar_in_chunks(chunk_iterator, output_file, file_type, compression_level=3):
     """
     将数据块迭代器转换为Parquet列式存储格式
     
     参数:
-        chunk_iterator (Iterator[pd.DataFrame]): 输入数据块迭代器
+        chunk_iterator (Iterator[pa.RecordBatch | pa.Table]): 输入数据块迭代器
         output_file (str): 输出Parquet文件路径
         file_type (str): 原始文件类型（用于元数据）
+        compression_level (int): Parquet列块的ZSTD压缩级别，默认3；需要更高压缩率时可调高
     
     异常:
-        Exception: 转换过程中出现错误时抛出
+        LossyCastError: 数据块的值无法按推断类型无损还原时抛出
+        RaggedRowsError: 读取过程中出现列数不足的行时抛出
+        Exception: 转换过程中出现其他错误时抛出
     """
+    parquet_writer = None
     try:
         first_chunk = next(chunk_iterator)
-        schema = pa.Schema.from_pandas(first_chunk, preserve_index=False)
-        schema = schema.with_metadata({b'original_extension': file_type.encode()})
-        
-        for field in schema:
+
+        # 一次性构建目标schema：统一重命名为col_i，并保留字段与文件类型元数据
+        fields = []
+        for i, field in enumerate(first_chunk.schema):
+            field = field.with_name(f"col_{i}")
             if pa.types.is_string(field.type):
                 # 对长文本列启用压缩
-                new_field = field.with_metadata({b'compression': b'ZSTD'})
-                schema = schema.set(schema.get_field_index(field.name), new_field)
+                field = field.with_metadata({b'compression': b'ZSTD'})
+            fields.append(field)
+        # 保留读取器附带的元数据（如检测到的分隔符），并记录原始文件类型
+        metadata = dict(first_chunk.schema.metadata or {})
+        metadata[b'original_extension'] = file_type.encode()
+        schema = pa.schema(fields, metadata=metadata)
+
+        # 读取器已按col_i命名时直接透传，否则零拷贝套用目标schema
+        if first_chunk.schema.names != schema.names:
+            first_chunk = type(first_chunk).from_arrays(first_chunk.columns, schema=schema)
 
-        first_chunk.columns = [f"col_{i}" for i in range(first_chunk.shape[1])]
-        schema = pa.Schema.from_pandas(first_chunk, preserve_index=False)
-        table = pa.Table.from_pandas(first_chunk)
+        # 仅对低基数列启用字典编码，高基数列直接PLAIN编码
+        dict_cols = _select_dictionary_columns(first_chunk)
 
+        # 在Parquet内部按列块进行ZSTD压缩，无需再对整个文件做二次压缩
         parquet_writer = pq.ParquetWriter(
             output_file,
             schema,
-            compression='NONE',
-            use_dictionary=True,
+            compression='ZSTD',
+            compression_level=compression_level,
+            use_dictionary=dict_cols,
+            dictionary_pagesize_limit=2 << 20,
+            data_page_size=1 << 20,  # 1MB数据页，增大ZSTD单页匹配窗口
+            write_batch_size=8192,  # 编码批次适配L2缓存
             write_statistics=True,
             flavor='spark'
         )
-        parquet_writer.write_table(table)
+        parquet_writer.write(first_chunk)
         logging.info(f"Parquet schema初始化完成: {schema}")
 
         for chunk in chunk_iterator:
-            chunk.columns = [f"col_{i}" for i in range(chunk.shape[1])]
-            table = pa.Table.from_pandas(chunk)
-            parquet_writer.write_table(table)
-            logging.debug(f"写入分块数据，大小: {chunk.shape[0]}行")
+            if chunk.schema.names != schema.names:
+                chunk = type(chunk).from_arrays(chunk.columns, schema=schema)
+            parquet_writer.write(chunk)
+            logging.debug("写入分块数据，大小: %d行", chunk.num_rows)
 
         parquet_writer.close()
         logging.info(f"列式存储文件生成: {output_file}")
 
     except Exception as e:
-        logging.error(f"列式转换失败: {str(e)}")
+        # 类型无法无损还原或需要补齐列时由调用方重新转换，不记为错误
+        if not isinstance(e, (LossyCastError, RaggedRowsError)):
+            logging.error(f"列式转换失败: {str(e)}")
+        if parquet_writer is not None:
+            # 关闭写入器释放文件句柄，便于调用方重试覆盖输出文件
+            parquet_writer.close()
         raise
 
 
@@ -67,32 +142,36 @@ def convert_parquet_to_text_in_chunks(parquet_file_path, text_file_path, file_ty
     异常:
         ValueError: 不支持的文件类型时抛出
     """
-    if file_type == "tbl":
-        sep = "|"
-    elif file_type == "csv":
-        sep = ","
-    elif file_type == "txt":
-        sep = "\t"
-    else:
+    if file_type not in _FMT:
         raise ValueError(f"不支持的文件类型: {file_type}")
     try:
-        # 使用 newline='' 让系统自动处理换行符
-        with pq.ParquetFile(parquet_file_path) as parquet_file:
-            with open(text_file_path, "w", encoding="utf-8", newline='') as f:  # 关键修改
-                is_first_chunk = True
-                for batch in parquet_file.iter_batches(batch_size=50000):
-                    df = batch.to_pandas()
-                    # 仅在非首行时写入时添加换行符
-                    df_string = df.to_csv(
-                        sep=sep,
-                        header=False,
-                        index=False,
-                        lineterminator='\n'  # 强制使用 \n 换行
-                    )
-                    if not is_first_chunk:
-                        f.write('\n')  # 手动添加分块间的换行
-                    f.write(df_string.strip('\n'))  # 移除末尾自带的换行符
-                    is_first_chunk = False
+        # 自行打开源文件，直接得到其大小用于之后的页缓存释放
+        with pa.OSFile(parquet_file_path) as source, pq.ParquetFile(source) as parquet_file:
+            parquet_size = source.size()
+            # 优先使用压缩时检测到的分隔符，旧文件没有该元数据时按文件类型的默认分隔符
+            metadata = parquet_file.schema_arrow.metadata or {}
+            sep = metadata.get(b'delimiter', _FMT[file_type][0].encode()).decode()
+            write_options = pa_csv.WriteOptions(include_header=False, delimiter=sep, quoting_style='none')
+            # 使用Arrow原生文件句柄，写出时不经过Python文件对象
+            with pa.OSFile(text_file_path, "wb") as sink:
+                # 较大的批次减少逐批的引号检查与写出调用开销，列解码由Arrow多线程完成
+                for batch in parquet_file.iter_batches(batch_size=_TEXT_BATCH_SIZE, use_threads=True):
+                    if _needs_quoting(batch, sep):
+                        # 含分隔符/引号/换行的数据块按最小引用规则写出，保证与原文件一致
+                        batch.to_pandas(integer_object_nulls=True).to_csv(
+                            sink,
+                            sep=sep,
+                            header=False,
+                            index=False,
+                            lineterminator='\n'
+                        )
+                    else:
+                        # Arrow原生CSV写出，每行自带换行符
+                        pa_csv.write_csv(batch, sink, write_options)
+                text_size = sink.tell()
+        # 还原的文本文件可能远大于可用缓存：释放已读完的Parquet与已写出的文本的页缓存
+        drop_page_cache(parquet_file_path, parquet_size)
+        drop_page_cache(text_file_path, text_size, written=True)
         logging.info(f"成功转换 Parquet 到文本: {text_file_path}")
     except Exception as e:
         logging.error(f"Parquet 转换失败: {parquet_file_path} -> {text_file_path} - {str(e)}")
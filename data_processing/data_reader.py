@@ -1,90 +1,369 @@
-import pandas as pd
-import logging
+import csv
+import mmap
+import os
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import logging
+
+from utils.page_cache import drop_page_cache
+
+
+class LossyCastError(ValueError):
+    """推断出的列类型无法把某列的值按原文还原（如 007、+5），需按字符串重新读取"""
+
+
+class RaggedRowsError(ValueError):
+    """预览之后出现列数不足的数据行，需以 pad_rows=True 重新读取"""
 
 
-def read_file_data_in_chunks(file_path, file_type):
+# 各文件类型对应的 (分隔符, 引号字符, 转义字符)
+_FMT = {
+    'tbl': ('|', '"', '\\'),
+    'csv': (',', '"', '\\'),
+    'txt': ('\t', '"', '\\'),
+}
+
+
+def read_file_data_in_chunks(file_path, file_type, infer_types=True, pad_rows=False):
     """
     分块读取结构化文件数据并生成迭代器
     
     参数:
         file_path (str): 输入文件路径
         file_type (str): 文件类型（tbl/csv/txt）
+        infer_types (bool): 是否根据文件头部样本推断整数/日期列类型，为False时所有列按字符串读取
+        pad_rows (bool): 是否逐行解析并以空值补齐列数不足的行；预览行列数不一致时自动启用
     
     返回:
-        Iterator[pd.DataFrame]: 数据块迭代器
+        Iterator[pa.RecordBatch]: 数据块迭代器，schema元数据 b'delimiter' 记录检测到的分隔符
     
     异常:
         ValueError: 当文件类型不支持或文件内容异常时抛出
+        LossyCastError: 迭代过程中某列的值无法按推断类型无损还原时抛出，
+            此时应以 infer_types=False 重新读取
+        RaggedRowsError: 迭代过程中出现列数不足的行时抛出，此时应以 pad_rows=True 重新读取
     """
-    if file_type == "tbl":
-        sep = "|"
-        quotechar = '"'  # 新增引号处理
-        escapechar = '\\'
-    elif file_type == "csv":
-        sep = ","
-        quotechar = '"'
-        escapechar = '\\'
-    elif file_type == "txt":
-        sep = "\t"
-        quotechar = '"'
-        escapechar = '\\'
-    else:
+    if file_type not in _FMT:
         raise ValueError(f"Unsupported file type: {file_type}")
+    sep, quotechar, escapechar = _FMT[file_type]
     try:
-        # 增强型列数检测
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            sep = '|' if file_path == 'tbl' else ','
-            expected_columns = len(first_line.split(sep))
-
-            # 读取足够多的行确保检测准确
-            preview_lines = [f.readline() for _ in range(20) if f.readline()]
-
-            # 动态检测最佳分隔符（备用方案）
-            if not preview_lines:
-                raise ValueError("空文件")
-
-            # 排除空行和注释行
-            valid_lines = [line.strip() for line in preview_lines if line.strip() and not line.startswith("#")]
-            if not valid_lines:
-                raise ValueError("没有有效数据行")
-            
-            # 列数一致性检查
-            column_counts = [len(line.split(sep)) for line in valid_lines]
-            if len(set(column_counts)) > 1:
-                logging.warning("检测到动态列数，尝试修复...")
-                
-            # 尝试寻找更可靠的分隔符
-            possible_seps = ['|', ',', '\t']
-            sep_counter = Counter()
-            for line in valid_lines:
-                for s in possible_seps:
-                    sep_counter[s] += line.count(s)
-            detected_sep = sep_counter.most_common(1)[0][0]
-            if detected_sep != sep:
-                logging.info(f"自动切换分隔符为: {repr(detected_sep)}")
-                sep = detected_sep
-                column_counts = [len(line.split(sep)) for line in valid_lines]
-                num_columns = max(set(column_counts), key=column_counts.count)
-                logging.info(f"检测到稳定列数: {num_columns}")
-                
-            # 动态列名生成
-            column_names = [f"col_{i}" for i in range(num_columns)]
-            
-        chunk_iterator = pd.read_csv(
-            file_path,
-            sep=sep,
-            header=None,
-            names=column_names,
-            dtype='category',  # 整体使用category类型
-            quotechar=quotechar,
-            escapechar=escapechar,
-            chunksize=50000,  # 每次读取50000行
-            engine='python',  # 使用Python引擎增强兼容性
-            encoding_errors='replace'
+        head, sep, preview_rows, file_size = _probe_head(file_path, sep, quotechar, escapechar)
+
+        # 列数一致性检查：分隔符确定后统一按多数行的列数为准
+        column_counts = Counter(len(row) for row in preview_rows)
+        if len(column_counts) > 1:
+            logging.warning("检测到动态列数，列数不足的行将以空值补齐")
+            pad_rows = True
+        num_columns = column_counts.most_common(1)[0][0]
+        logging.info(f"检测到稳定列数: {num_columns}")
+
+        # 动态列名生成
+        column_names = [f"col_{i}" for i in range(num_columns)]
+
+        parse_options = pa_csv.ParseOptions(
+            delimiter=sep,
+            quote_char=quotechar,
+            escape_char=escapechar
         )
-        return chunk_iterator
+
+        # 用头部样本推断一次列类型，后续数据块按该schema转换
+        if infer_types:
+            target_schema = _infer_lossless_schema(head, column_names, parse_options)
+        else:
+            target_schema = pa.schema([(name, pa.string()) for name in column_names])
+        # 记录实际使用的分隔符，还原时按同一分隔符写回
+        target_schema = target_schema.with_metadata({b'delimiter': sep.encode()})
+        logging.info(f"列类型: {dict(zip(target_schema.names, map(str, target_schema.types)))}")
+
+        if pad_rows:
+            return _iter_padded_batches(file_path, file_size, sep, quotechar, escapechar, target_schema)
+        return _open_record_batches(file_path, file_size, column_names, parse_options, target_schema)
+    except RaggedRowsError:
+        raise
     except Exception as e:
         logging.error(f"解析失败：{file_path} - {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _open_record_batches(file_path, file_size, column_names, parse_options, target_schema):
+    """
+    使用Arrow流式CSV读取器打开文件，返回按目标schema转换的数据块迭代器
+    
+    参数:
+        file_path (str): 输入文件路径
+        file_size (int): 输入文件大小（字节）
+        column_names (list): 列名列表
+        parse_options (pa_csv.ParseOptions): CSV解析选项
+        target_schema (pa.Schema): 数据块转换的目标schema
+    
+    返回:
+        Iterator[pa.RecordBatch]: 数据块迭代器
+    
+    异常:
+        RaggedRowsError: 首个数据块中存在列数不符的行时抛出
+    """
+    # 使用PyArrow多线程CSV解析器流式读取，直接生成Arrow列式数据
+    read_options = pa_csv.ReadOptions(
+        block_size=64 << 20,  # 每块64MB，对应写出较大的Parquet行组
+        use_threads=True,
+        column_names=column_names
+    )
+    convert_options = pa_csv.ConvertOptions(
+        # 先按字节读取，转换时再解码为UTF-8并校验可无损还原，单个非法字节不会导致整个文件失败
+        column_types={name: pa.binary() for name in column_names},
+        null_values=[''],  # 只有空字段视为空值，NULL、n/a 等文本原样保留
+        strings_can_be_null=True
+    )
+    # 记录列数不符的行，以便把Arrow的解析错误转换为 RaggedRowsError
+    invalid_rows = []
+
+    def record_invalid_row(row):
+        invalid_rows.append(row.text)
+        return 'error'
+
+    parse_options.invalid_row_handler = record_invalid_row
+    try:
+        reader = pa_csv.open_csv(file_path, read_options, parse_options, convert_options)
+    except pa.ArrowInvalid as e:
+        _raise_if_ragged(invalid_rows, e)
+        raise
+    return _iter_record_batches(file_path, file_size, reader, target_schema, invalid_rows)
+
+
+def _probe_head(file_path, sep, quotechar, escapechar):
+    """
+    读取文件头部样本，检测分隔符并解析预览行
+    
+    参数:
+        file_path (str): 输入文件路径
+        sep (str): 文件类型对应的默认分隔符
+        quotechar (str): 引号字符
+        escapechar (str): 转义字符
+    
+    返回:
+        tuple: (头部完整行的字节串, 最终分隔符, 预览行列表, 文件大小)
+    
+    异常:
+        ValueError: 文件为空或没有有效数据行时抛出
+    """
+    # 增强型列数检测：映射文件后只访问头部，避免逐行读取
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0:
+            raise ValueError("空文件")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # 取前64KB内的完整行；首行超过64KB时向后找到首个换行符为止
+            head_end = file_size
+            if file_size > 65536:
+                head_end = mm.rfind(b'\n', 0, 65536) + 1 or mm.find(b'\n', 65536) + 1 or file_size
+            head = mm[:head_end]
+
+    # 排除空行和注释行，最多取前21行用于检测
+    valid_lines = [line for line in head.splitlines()[:21] if line.strip() and not line.startswith(b"#")]
+    if not valid_lines:
+        raise ValueError("没有有效数据行")
+
+    # 对有效预览行做一次向量化遍历，统计候选分隔符的出现次数（不计注释行）
+    candidate_seps = ('|', ',', '\t')
+    preview_bytes = np.frombuffer(b"\n".join(valid_lines), dtype=np.uint8)
+    sep_counts = np.bincount(preview_bytes, minlength=256)[[ord(c) for c in candidate_seps]]
+    best = int(np.argmax(sep_counts))
+    # 只有其他候选分隔符出现得严格更多时才切换；全部为0或并列时保留文件类型的默认分隔符
+    if sep_counts[best] > sep_counts[candidate_seps.index(sep)]:
+        sep = candidate_seps[best]
+        logging.info(f"自动切换分隔符为: {repr(sep)}")
+
+    # 按最终分隔符解析预览行（正确处理引号内的分隔符）
+    preview_rows = list(csv.reader(
+        (line.decode('utf-8', errors='replace') for line in valid_lines),
+        delimiter=sep,
+        quotechar=quotechar,
+        escapechar=escapechar
+    ))
+    return head, sep, preview_rows, file_size
+
+
+def _infer_lossless_schema(sample, column_names, parse_options):
+    """
+    根据文件头部样本推断列类型
+    
+    只保留写回文本时格式不变的类型（整数、日期）；浮点数等类型写回时会
+    丢失原始格式（如 901.00 -> 901），仍按字符串处理
+    
+    参数:
+        sample (bytes): 文件头部的完整行
+        column_names (list): 列名列表
+        parse_options (pa_csv.ParseOptions): CSV解析选项
+    
+    返回:
+        pa.Schema: 目标schema
+    """
+    lossless_types = (pa.int64(), pa.date32())
+    try:
+        sample_table = pa_csv.read_csv(
+            pa.BufferReader(sample),
+            read_options=pa_csv.ReadOptions(column_names=column_names),
+            # 列数不符的样本行不参与推断
+            parse_options=pa_csv.ParseOptions(
+                delimiter=parse_options.delimiter,
+                quote_char=parse_options.quote_char,
+                escape_char=parse_options.escape_char,
+                invalid_row_handler=lambda row: 'skip'
+            ),
+            convert_options=pa_csv.ConvertOptions(null_values=[''], strings_can_be_null=True)
+        )
+    except pa.ArrowInvalid as e:
+        logging.warning(f"样本类型推断失败，所有列按字符串读取: {str(e)}")
+        return pa.schema([(name, pa.string()) for name in column_names])
+    return pa.schema([
+        (name, inferred if inferred in lossless_types else pa.string())
+        for name, inferred in zip(column_names, sample_table.schema.types)
+    ])
+
+
+def _cast_batch(batch, target_schema):
+    """
+    将字符串数据块转换为目标schema，并校验转换结果可按原文还原
+    
+    参数:
+        batch (pa.RecordBatch): 按字符串读取的数据块
+        target_schema (pa.Schema): 目标schema
+    
+    返回:
+        pa.RecordBatch: 转换后的数据块
+    
+    异常:
+        LossyCastError: 某列的值无法按目标类型无损还原时抛出
+    """
+    columns = []
+    for column, field in zip(batch.columns, target_schema):
+        if pa.types.is_binary(column.type):
+            column = _decode_utf8(column, field.name)
+        if column.type != field.type:
+            try:
+                converted = column.cast(field.type)
+            except pa.ArrowInvalid as e:
+                # 样本之后出现无法解析的值（如整数列中的 n/a）
+                raise LossyCastError(f"列 {field.name} 的值无法转换为 {field.type} 类型: {str(e)}") from e
+            # 形如 007、+5 的值能转换成功但写回时格式会变化，视为不可无损还原
+            if pc.all(pc.equal(converted.cast(pa.string()), column)).as_py() is False:
+                raise LossyCastError(f"列 {field.name} 的值无法按 {field.type} 类型无损还原")
+            column = converted
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=target_schema)
+
+
+def _decode_utf8(column, name):
+    """
+    将字节列解码为UTF-8字符串列，非法字节替换为U+FFFD
+    
+    参数:
+        column (pa.Array): 二进制列
+        name (str): 列名（用于日志）
+    
+    返回:
+        pa.Array: 字符串列
+    """
+    try:
+        return column.cast(pa.string())
+    except pa.ArrowInvalid:
+        # 仅含非法字节的数据块走逐值解码，其余数据块保持零拷贝转换
+        logging.warning(f"列 {name} 含有非UTF-8字节，已替换为U+FFFD")
+        return pa.array(
+            [None if value is None else value.decode('utf-8', errors='replace') for value in column.to_pylist()],
+            type=pa.string()
+        )
+
+
+def _raise_if_ragged(invalid_rows, error):
+    """Arrow解析错误由列数不符的行引起时抛出 RaggedRowsError"""
+    if invalid_rows:
+        raise RaggedRowsError(f"存在列数不符的数据行: {invalid_rows[0][:200]!r}") from error
+
+
+def _read_next_batch(reader, target_schema, invalid_rows):
+    """读取并转换下一个数据块，读完时返回None"""
+    try:
+        batch = reader.read_next_batch()
+    except StopIteration:
+        return None
+    except pa.ArrowInvalid as e:
+        _raise_if_ragged(invalid_rows, e)
+        raise
+    return _cast_batch(batch, target_schema)
+
+
+def _iter_record_batches(file_path, file_size, reader, target_schema, invalid_rows):
+    """
+    逐块读取RecordBatchReader中的数据，并在后台线程预取下一块，
+    使下游写入Parquet与CSV解析重叠进行；读完后释放输入文件的页缓存
+
+    参数:
+        file_path (str): 输入文件路径
+        file_size (int): 输入文件大小（字节）
+        reader (pa.RecordBatchReader): Arrow流式读取器
+        target_schema (pa.Schema): 数据块转换的目标schema
+        invalid_rows (list): 解析器记录的列数不符的行
+
+    返回:
+        Iterator[pa.RecordBatch]: 数据块迭代器
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(_read_next_batch, reader, target_schema, invalid_rows)
+        while True:
+            batch = future.result()
+            if batch is None:
+                break
+            future = executor.submit(_read_next_batch, reader, target_schema, invalid_rows)
+            yield batch
+    drop_page_cache(file_path, file_size)
+
+
+def _iter_padded_batches(file_path, file_size, sep, quotechar, escapechar, target_schema, batch_rows=65536):
+    """
+    逐行解析文件，以空值补齐列数不足的行后按批生成数据块
+    
+    仅用于列数不一致的文件：解码错误按U+FFFD替换，与Arrow读取路径一致地跳过空行，
+    空字段视为空值。补齐的行还原时会带上多出的分隔符
+    
+    参数:
+        file_path (str): 输入文件路径
+        file_size (int): 输入文件大小（字节）
+        sep (str): 字段分隔符
+        quotechar (str): 引号字符
+        escapechar (str): 转义字符
+        target_schema (pa.Schema): 数据块转换的目标schema
+        batch_rows (int): 每批行数
+    
+    返回:
+        Iterator[pa.RecordBatch]: 数据块迭代器
+    
+    异常:
+        RaggedRowsError: 某行的列数多于检测到的列数时抛出
+    """
+    num_columns = len(target_schema)
+    with open(file_path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f, delimiter=sep, quotechar=quotechar, escapechar=escapechar)
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) > num_columns:
+                raise RaggedRowsError(f"第 {reader.line_num} 行有 {len(row)} 列，多于检测到的 {num_columns} 列")
+            rows.append([value or None for value in row] + [None] * (num_columns - len(row)))
+            if len(rows) == batch_rows:
+                yield _rows_to_batch(rows, target_schema)
+                rows = []
+        if rows:
+            yield _rows_to_batch(rows, target_schema)
+        drop_page_cache(f, file_size)
+
+
+def _rows_to_batch(rows, target_schema):
+    """将补齐后的行列表转置为字符串数据块，再转换为目标schema"""
+    columns = [pa.array(values, type=pa.string()) for values in zip(*rows)]
+    return _cast_batch(pa.RecordBatch.from_arrays(columns, names=target_schema.names), target_schema)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 使测试可以直接导入项目根目录下的各个包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import pyarrow as pa
+import pytest
+
+from data_processing.data_reader import RaggedRowsError, read_file_data_in_chunks
+
+
+def _read_all(path, file_type, **kwargs):
+    return pa.Table.from_batches(list(read_file_data_in_chunks(str(path), file_type, **kwargs)))
+
+
+def test_first_line_longer_than_probe_window(tmp_path):
+    path = tmp_path / "long.csv"
+    path.write_text("1," + "x" * 70000 + "\n2,y\n")
+
+    table = _read_all(path, "csv")
+
+    assert table.num_rows == 2
+    assert table.column("col_1").to_pylist() == ["x" * 70000, "y"]
+
+
+def test_single_line_without_newline_longer_than_probe_window(tmp_path):
+    path = tmp_path / "long.csv"
+    path.write_text("1," + "x" * 70000)
+
+    assert _read_all(path, "csv").num_rows == 1
+
+
+def test_invalid_utf8_bytes_are_replaced(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_bytes(b"1,caf\xe9,3\n2,ok,4\n")
+
+    table = _read_all(path, "csv")
+
+    assert table.column("col_1").to_pylist() == ["caf�", "ok"]
+
+
+def test_short_rows_in_preview_are_padded(tmp_path):
+    path = tmp_path / "ragged.csv"
+    path.write_text("1,2,3\n4,5\n6,7,8\n")
+
+    table = _read_all(path, "csv")
+
+    assert table.to_pylist()[1] == {"col_0": 4, "col_1": 5, "col_2": None}
+
+
+def test_short_row_after_preview_requires_padding(tmp_path):
+    path = tmp_path / "ragged.csv"
+    path.write_text("".join(f"{i},a,b\n" for i in range(30000)) + "4,5\n")
+
+    with pytest.raises(RaggedRowsError):
+        _read_all(path, "csv")
+
+    table = _read_all(path, "csv", pad_rows=True)
+    assert table.num_rows == 30001
+    assert table.to_pylist()[-1] == {"col_0": 4, "col_1": "5", "col_2": None}
@@ -0,0 +1,116 @@
+import logging
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conversion.parquet_converter import convert_parquet_to_text_in_chunks
+from data_processing.data_reader import LossyCastError, _cast_batch
+
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+    for name in ("data", "compress", "decompress"):
+        os.makedirs(tmp_path / name, exist_ok=True)
+        monkeypatch.setattr(main, f"{name}_dir", str(tmp_path / name))
+    return main
+
+
+def _round_trip(main, file_name, content):
+    """压缩后再还原，返回 (Parquet schema, 还原后的字节)"""
+    with open(os.path.join(main.data_dir, file_name), "wb") as f:
+        f.write(content)
+    main._process_one_file(file_name)
+    (parquet_name,) = os.listdir(main.compress_dir)
+    parquet_path = os.path.join(main.compress_dir, parquet_name)
+    output_path = os.path.join(main.decompress_dir, file_name)
+    convert_parquet_to_text_in_chunks(parquet_path, output_path, file_name.split(".")[-1])
+    with open(output_path, "rb") as f:
+        return pq.read_schema(parquet_path), f.read()
+
+
+def test_integer_date_and_nullable_integer_columns_round_trip(main_module):
+    content = b"1|2024-01-05|10|a\n2|2024-02-29||b\n3|1999-12-31|-7|c\n"
+
+    schema, restored = _round_trip(main_module, "t.tbl", content)
+
+    assert schema.types[:3] == [pa.int64(), pa.date32(), pa.int64()]
+    assert restored == content
+
+
+@pytest.mark.parametrize("value", [b"007", b"+5"])
+def test_values_changed_by_integer_cast_fall_back_to_strings(main_module, caplog, value):
+    content = b"1|3\n2|" + value + b"\n3|4\n"
+
+    with caplog.at_level(logging.INFO):
+        schema, restored = _round_trip(main_module, "t.tbl", content)
+
+    assert schema.field("col_1").type == pa.string()
+    assert restored == content
+    assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+
+
+def test_unparseable_value_after_sample_falls_back_to_strings(main_module):
+    # 样本只覆盖前64KB，之后出现的非整数值需要触发按字符串重新转换
+    content = b"".join(b"%d|x\n" % i for i in range(20000)) + b"abc|x\n"
+
+    schema, restored = _round_trip(main_module, "t.tbl", content)
+
+    assert schema.field("col_0").type == pa.string()
+    assert restored == content
+
+
+def test_null_like_text_is_kept(main_module):
+    content = b"1|NULL\n2|n/a\n3|NA\n4|\n"
+
+    _, restored = _round_trip(main_module, "t.tbl", content)
+
+    assert restored == content
+
+
+def test_short_row_after_sample_is_padded(main_module, caplog):
+    content = b"".join(b"%d|a|b\n" % i for i in range(30000)) + b"4|5\n"
+
+    with caplog.at_level(logging.INFO):
+        _, restored = _round_trip(main_module, "t.tbl", content)
+
+    # 补齐的行还原时带上多出的分隔符
+    assert restored == content[:-len(b"4|5\n")] + b"4|5|\n"
+    assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+
+
+def test_same_base_name_with_different_extensions_do_not_collide(main_module):
+    for file_name, content in (("t.csv", b"1,a\n"), ("t.tbl", b"2|b\n")):
+        with open(os.path.join(main_module.data_dir, file_name), "wb") as f:
+            f.write(content)
+        main_module._process_one_file(file_name)
+
+    assert sorted(os.listdir(main_module.compress_dir)) == ["t.csv.parquet", "t.tbl.parquet"]
+
+
+@pytest.mark.parametrize("file_name, content", [
+    ("t.txt", b"a, b, c\td\ne, f, g\th\n"),
+    ("t.csv", b"a|b\nc|d\n"),
+])
+def test_detected_separator_is_used_on_restore(main_module, file_name, content):
+    _, restored = _round_trip(main_module, file_name, content)
+
+    assert restored == content
+
+
+def test_default_separator_kept_when_no_candidate_occurs(main_module):
+    schema, restored = _round_trip(main_module, "t.txt", b"abc\ndef\n")
+
+    assert schema.metadata[b"delimiter"] == b"\t"
+    assert restored == b"abc\ndef\n"
+
+
+def test_cast_batch_rejects_lossy_integer_text():
+    batch = pa.record_batch([pa.array(["1", "+5", None])], names=["col_0"])
+    target = pa.schema([("col_0", pa.int64())])
+
+    with pytest.raises(LossyCastError):
+        _cast_batch(batch, target)
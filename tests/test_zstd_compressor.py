@@ -0,0 +1,41 @@
+import os
+
+import zstandard as zstd
+
+from compression.zstd_compressor import compress_many, compress_with_zstd, decompress_with_zstd
+
+
+def test_compress_many_round_trip(tmp_path):
+    contents = [
+        b"1|abc|2024-01-01\n" * 10000,
+        os.urandom(50000),
+        b"",
+    ]
+    pairs = []
+    for i, data in enumerate(contents):
+        path = tmp_path / f"in_{i}.tbl"
+        path.write_bytes(data)
+        pairs.append((str(path), str(tmp_path / f"in_{i}.tbl.zst")))
+
+    sizes = compress_many(pairs, workers=2)
+
+    assert sizes == [(len(data), os.path.getsize(out)) for data, (_, out) in zip(contents, pairs)]
+    for i, (data, (_, out)) in enumerate(zip(contents, pairs)):
+        # 帧头中应写入原始大小，解压端可据此一次性分配输出
+        with open(out, "rb") as f:
+            assert zstd.get_frame_parameters(f.read()).content_size == len(data)
+        restored = tmp_path / f"out_{i}.tbl"
+        decompress_with_zstd(out, str(restored))
+        assert restored.read_bytes() == data
+
+
+def test_compress_with_zstd_multithreaded_matches_input(tmp_path):
+    data = b"x,y,z\n" * 200000
+    src = tmp_path / "in.csv"
+    src.write_bytes(data)
+    out = tmp_path / "in.csv.zst"
+
+    original_size, compressed_size = compress_with_zstd(str(src), str(out), threads=2)
+
+    assert (original_size, compressed_size) == (len(data), os.path.getsize(out))
+    assert zstd.ZstdDecompressor().decompress(out.read_bytes()) == data
@@ -1,3 +1,4 @@
+import logging
 from collections import defaultdict
 
 
@@ -12,6 +13,8 @@ def init_compression_stats():
             - file_count: 处理文件数量
             - total_compress_time: 总压缩时间（秒）
             - total_decompress_time: 总解压时间（秒）
+            - per_file_compress: 每个文件的压缩耗时列表（秒）
+            - per_file_decompress: 每个文件的解压耗时列表（秒）
     """
     return {
         'total_original': 0,
@@ -19,6 +22,8 @@ def init_compression_stats():
         'file_count': 0,
         'total_compress_time': 0,
         'total_decompress_time': 0,
+        'per_file_compress': [],
+        'per_file_decompress': [],
     }
 
 
@@ -1,10 +1,21 @@
 import logging
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+import pyarrow as pa
 
-def setup_logging():
+# 日志队列，由 setup_logging 创建后供进程池工作进程使用
+_log_queue = None
+
+
+def setup_logging(log_file='compression.log', level=logging.INFO):
     """
     配置全局日志记录器
-    
+
+    日志记录先放入队列，由后台线程统一格式化并写入控制台和文件（带轮转），
+    避免在转换数据的热路径上同步写磁盘。队列可跨进程使用，
+    进程池中的工作进程通过 init_worker 接入同一队列。
+
     DEBUG（最低级别，用于详细信息）
     INFO（用于一般信息）
     WARNING（用于警告信息）
@@ -15,12 +26,63 @@ def setup_logging():
     %(levelname)s：日志级别名称（如INFO、WARNING等）
     %(name)s：日志记录器的名称
     %(message)s：日志消息本身
+
+    参数:
+        log_file (str): 日志文件路径
+        level (int): 日志级别
+
+    返回:
+        QueueListener: 后台日志监听器，程序结束前需调用 stop() 写出剩余日志
+    """
+    global _log_queue
+
+    # 创建日志格式器
+    formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
+
+    # 创建控制台处理器
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    # 创建文件处理器（带轮转）
+    file_handler = RotatingFileHandler(log_file, maxBytes=10*1024*1024, backupCount=5)
+    file_handler.setFormatter(formatter)
+
+    # 根日志记录器只负责入队，实际输出由监听线程完成
+    _log_queue = multiprocessing.Queue()
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(QueueHandler(_log_queue))
+
+    listener = QueueListener(_log_queue, console_handler, file_handler)
+    listener.start()
+
+    return listener
+
+
+def get_log_queue():
+    """
+    获取 setup_logging 创建的日志队列
+
+    返回:
+        multiprocessing.Queue: 日志队列，尚未调用 setup_logging 时为None
+    """
+    return _log_queue
+
+
+def init_worker(log_queue, level, arrow_threads):
+    """
+    进程池工作进程的初始化函数：限制Arrow线程池大小，并将日志记录转发到主进程的日志队列
+
+    参数:
+        log_queue (multiprocessing.Queue): setup_logging 创建的日志队列，为None时不转发日志
+        level (int): 日志级别
+        arrow_threads (int): 本进程Arrow CPU线程池的线程数
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s %(levelname)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(),  # 输出到控制台
-            logging.FileHandler("compression.log")  # 写入日志文件
-        ]
-    )
\ No newline at end of file
+    # 各工作进程的CSV解析与Parquet编码共享机器的CPU核数，避免线程过度订阅
+    pa.set_cpu_count(arrow_threads)
+    if log_queue is None:
+        return
+    logger = logging.getLogger()
+    logger.handlers.clear()
+    logger.setLevel(level)
+    logger.addHandler(QueueHandler(log_queue))